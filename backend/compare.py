@@ -0,0 +1,186 @@
+"""Scenario comparison: per-building transitions and per-DataZone deltas.
+
+scripts/preprocess_data.py precomputes, for each scenario pair, a one-byte
+transition code per building (aligned with buildings.geojson feature order)
+into web_data/scenario_transitions.npz, and the aggregate / per-DataZone
+deltas into web_data/scenario_comparisons.json. The npz also records the
+building count and a digest of the OSIDs in feature order; the same pair is
+written next to buildings.geojson (buildings_digest.json) together with a
+hash of the file, so the API can refuse to hand out indices once
+buildings.geojson has been regenerated without the transitions, without
+parsing it. Only the pairs in SCENARIO_PAIRS are stored; the reverse
+direction is derived by swapping codes and negating deltas, so every
+comparison is a lookup.
+"""
+import base64
+import hashlib
+import json
+import os
+
+import numpy as np
+
+SCENARIOS = ('h', 'm', 'l')
+SCENARIO_PAIRS = (('h', 'm'), ('h', 'l'), ('m', 'l'))
+
+# Code -> name. 999 (No Data) counts as flooded with an unknown depth band,
+# so a change to or from it is never a depth change.
+TRANSITIONS = (
+    'unchanged',
+    'newly_flooded',
+    'no_longer_flooded',
+    'depth_increased',
+    'depth_decreased',
+)
+NO_DATA = 999
+
+# Code in the reverse direction, indexed by code
+_REVERSED = np.array([0, 2, 1, 4, 3], dtype=np.uint8)
+
+# Aggregate fields that change sign when the comparison is reversed
+DELTA_FIELDS = ('damage_delta', 'units_at_risk_delta', 'affected_buildings_delta')
+
+
+def pair_key(from_scenario, to_scenario):
+    return f'{from_scenario}-{to_scenario}'
+
+
+def transition_codes(grid_from, grid_to):
+    """Transition code per building between two gridcode arrays."""
+    grid_from = np.asarray(grid_from)
+    grid_to = np.asarray(grid_to)
+    flooded_from = grid_from > 0
+    flooded_to = grid_to > 0
+    known = flooded_from & flooded_to & (grid_from != NO_DATA) & (grid_to != NO_DATA)
+
+    codes = np.zeros(grid_from.shape, dtype=np.uint8)
+    codes[~flooded_from & flooded_to] = TRANSITIONS.index('newly_flooded')
+    codes[flooded_from & ~flooded_to] = TRANSITIONS.index('no_longer_flooded')
+    codes[known & (grid_to > grid_from)] = TRANSITIONS.index('depth_increased')
+    codes[known & (grid_to < grid_from)] = TRANSITIONS.index('depth_decreased')
+    return codes
+
+
+def reverse_codes(codes):
+    return _REVERSED[codes]
+
+
+def transition_counts(codes):
+    counts = np.bincount(codes, minlength=len(TRANSITIONS))
+    return {name: int(counts[i]) for i, name in enumerate(TRANSITIONS)}
+
+
+def reverse_summary(summary):
+    """Flip a precomputed pair summary to the opposite direction."""
+    def flip(entry):
+        flipped = {k: -v if k in DELTA_FIELDS else v for k, v in entry.items()}
+        for a, b in (('newly_flooded', 'no_longer_flooded'), ('depth_increased', 'depth_decreased')):
+            if a in entry or b in entry:
+                flipped[a], flipped[b] = entry.get(b, 0), entry.get(a, 0)
+        return flipped
+
+    reversed_summary = flip({k: v for k, v in summary.items() if k not in ('transitions', 'zones')})
+    reversed_summary['transitions'] = flip(summary['transitions'])
+    reversed_summary['zones'] = {zone: flip(z) for zone, z in summary['zones'].items()}
+    return reversed_summary
+
+
+def pack_indices(indices):
+    """Base64 of little-endian uint32 building indices (feature order in buildings.geojson)."""
+    return base64.b64encode(np.asarray(indices, dtype='<u4').tobytes()).decode('ascii')
+
+
+def osid_digest(osids):
+    """Digest of building OSIDs in feature order, to tie indices to one buildings.geojson."""
+    return hashlib.sha256('\n'.join(str(o) for o in osids).encode('utf-8')).hexdigest()
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def write_buildings_digest(digest_path, buildings_path, osids):
+    """Record the OSID digest of a freshly written buildings GeoJSON next to it."""
+    osids = list(osids)
+    with open(digest_path, 'w') as f:
+        json.dump({
+            'n_buildings': len(osids),
+            'osid_digest': osid_digest(osids),
+            'sha256': file_sha256(buildings_path),
+        }, f)
+
+
+def buildings_digest(digest_path, buildings_path):
+    """(n_buildings, osid_digest) of a buildings GeoJSON, from its digest file.
+
+    Returns None when either file is missing or the digest file was written
+    for different file contents. Hashing the file is far cheaper than
+    parsing it.
+    """
+    if not (os.path.exists(digest_path) and os.path.exists(buildings_path)):
+        return None
+    with open(digest_path, 'r') as f:
+        recorded = json.load(f)
+    if recorded['sha256'] != file_sha256(buildings_path):
+        return None
+    return recorded['n_buildings'], recorded['osid_digest']
+
+
+def load_transitions(path):
+    """Transition codes per pair, plus 'n_buildings' and 'osid_digest'."""
+    with np.load(path) as npz:
+        transitions = {key: npz[key] for key in npz.files}
+    transitions['n_buildings'] = int(transitions['n_buildings'])
+    transitions['osid_digest'] = str(transitions['osid_digest'])
+    return transitions
+
+
+def load_comparisons(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def compare_scenarios(transitions, comparisons, from_scenario, to_scenario,
+                      include_changed=False, changes=None):
+    """Build the /api/compare response for from_scenario -> to_scenario.
+
+    With include_changed, the indices of buildings whose transition is in
+    changes (default: any change) are returned packed, together with their
+    transition codes as base64 uint8.
+    """
+    if from_scenario == to_scenario:
+        n_buildings = transitions['n_buildings']
+        summary = {
+            **{field: 0 for field in DELTA_FIELDS},
+            'transitions': transition_counts(np.zeros(n_buildings, dtype=np.uint8)),
+            'zones': {},
+        }
+        codes = None
+    elif (from_scenario, to_scenario) in SCENARIO_PAIRS:
+        summary = comparisons[pair_key(from_scenario, to_scenario)]
+        codes = transitions[pair_key(from_scenario, to_scenario)] if include_changed else None
+    else:
+        summary = reverse_summary(comparisons[pair_key(to_scenario, from_scenario)])
+        codes = reverse_codes(transitions[pair_key(to_scenario, from_scenario)]) if include_changed else None
+
+    result = {'from': from_scenario, 'to': to_scenario, **summary}
+
+    if include_changed:
+        if codes is None:
+            indices = np.array([], dtype=np.uint32)
+            changed_codes = np.array([], dtype=np.uint8)
+        else:
+            wanted = [TRANSITIONS.index(c) for c in (changes or TRANSITIONS[1:])]
+            indices = np.flatnonzero(np.isin(codes, wanted))
+            changed_codes = codes[indices]
+        result['changed'] = {
+            'count': int(len(indices)),
+            'osid_digest': transitions['osid_digest'],
+            'codes': list(TRANSITIONS),
+            'indices': pack_indices(indices),
+            'transitions': base64.b64encode(changed_codes.astype(np.uint8).tobytes()).decode('ascii'),
+        }
+    return result
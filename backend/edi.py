@@ -0,0 +1,206 @@
+"""Environmental Deprivation Index (EDI) engine.
+
+Pure numpy so it can run inside the slim backend image. The heavy lifting
+(postcode shapefile, Oracle exports) is done once by edi_analysis.py, which
+caches per-sector inputs to web_data/edi_inputs.json. Everything here works
+from those cached arrays and scores every scenario and every weighting in a
+single broadcast.
+"""
+import json
+import os
+
+import numpy as np
+
+SCENARIOS = ('h', 'm', 'l')
+COMPONENTS = ('risk', 'crowding', 'deprivation')
+DEPRIVATION_SOURCES = ('price', 'simd')
+
+# Scores are normalised to 0-10 per component, as MinMaxScaler did before
+SCORE_RANGE = 10.0
+
+
+def load_edi_inputs(path):
+    """Load the cached per-sector inputs written by edi_analysis.py."""
+    with open(path, 'r') as f:
+        inputs = json.load(f)
+
+    # None marks missing values in the JSON (e.g. sectors with no price data)
+    return {
+        'sectors': inputs['sectors'],
+        'area_ha': np.asarray(inputs['area_ha'], dtype=float),
+        'buildings': np.asarray(inputs['buildings'], dtype=float),
+        'property_value': np.asarray(inputs['property_value'], dtype=float),
+        'simd_quintile': np.asarray(inputs['simd_quintile'], dtype=float),
+        'damage': np.asarray([inputs['damage'][s] for s in SCENARIOS], dtype=float),
+    }
+
+
+def _min_max(raw):
+    """Scale the last axis to 0-SCORE_RANGE; constant rows score 0."""
+    lo = raw.min(axis=-1, keepdims=True)
+    span = raw.max(axis=-1, keepdims=True) - lo
+    safe_span = np.where(span > 0, span, 1.0)
+    return np.where(span > 0, (raw - lo) / safe_span * SCORE_RANGE, 0.0)
+
+
+def component_scores(inputs, deprivation='price'):
+    """Return normalised component scores shaped (scenario, component, sector).
+
+    deprivation='price' uses the inverse average property value as a proxy;
+    deprivation='simd' uses the building-weighted SIMD quintile instead
+    (quintile 1 = most deprived).
+    """
+    if deprivation not in DEPRIVATION_SOURCES:
+        raise ValueError(f"deprivation must be one of {DEPRIVATION_SOURCES}")
+
+    area = inputs['area_ha']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # A. Risk: damage per hectare (one row per scenario)
+        risk = inputs['damage'] / area
+        # B. Crowding: buildings per hectare (proxy for lack of greenspace)
+        crowding = inputs['buildings'] / area
+        # C. Deprivation: higher raw value = more deprived
+        if deprivation == 'price':
+            dep = 1 / inputs['property_value']
+        else:
+            dep = 6 - inputs['simd_quintile']
+
+    n_scenarios = risk.shape[0]
+    raw = np.stack([
+        risk,
+        np.broadcast_to(crowding, risk.shape),
+        np.broadcast_to(dep, risk.shape),
+    ], axis=1)
+
+    # Missing inputs count as 0, as the original fillna(0) did
+    raw = np.where(np.isfinite(raw), raw, 0.0)
+    return _min_max(raw.reshape(n_scenarios * len(COMPONENTS), -1)).reshape(raw.shape)
+
+
+def compute_edi(scores, weights):
+    """Weight component scores into EDI, shaped (weighting, scenario, sector).
+
+    weights is a (weighting, 3) array of Risk, Crowding and Deprivation
+    weights; (1, 1, 1) reproduces the original unweighted sum.
+    """
+    weights = np.atleast_2d(np.asarray(weights, dtype=float))
+    return np.einsum('wc,scn->wsn', weights, scores)
+
+
+def weight_grid(divisions, total=3.0):
+    """Every (risk, crowding, deprivation) weighting summing to total.
+
+    Each weight moves in steps of total / divisions, giving
+    (divisions + 1) * (divisions + 2) / 2 weightings. With the default total
+    of 3 the grid includes the unweighted (1, 1, 1) case when divisions is a
+    multiple of 3.
+    """
+    i, j = np.meshgrid(np.arange(divisions + 1), np.arange(divisions + 1), indexing='ij')
+    keep = (i + j) <= divisions
+    i, j = i[keep], j[keep]
+    k = divisions - i - j
+    return np.stack([i, j, k], axis=1) * (total / divisions)
+
+
+def sweep_summary(edi):
+    """Summarise an EDI sweep across weightings for each scenario and sector.
+
+    Returns min/max/mean EDI and best/worst rank (1 = most deprived), each
+    shaped (scenario, sector).
+    """
+    ranks = (-edi).argsort(axis=-1).argsort(axis=-1) + 1
+    return {
+        'edi_min': edi.min(axis=0),
+        'edi_max': edi.max(axis=0),
+        'edi_mean': edi.mean(axis=0),
+        'rank_best': ranks.min(axis=0),
+        'rank_worst': ranks.max(axis=0),
+    }
+
+
+# --- Worker-side query execution ---
+# The API runs EDI queries in a process pool (see executor.py). The API
+# process computes the component scores once in prepare_worker_data() and
+# writes them as .npy files; every worker memory-maps the same read-only
+# pages instead of parsing edi_inputs.json into its own copy.
+
+_worker_state = {}
+
+
+def _save_atomic(path, array):
+    # Replace rather than overwrite, so workers still mapping the old file
+    # keep a valid view of it
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+def prepare_worker_data(inputs_path, data_dir):
+    """Write sectors and component scores for workers to memory-map.
+
+    Returns data_dir, or None when the EDI inputs have not been built yet.
+    """
+    if not os.path.exists(inputs_path):
+        return None
+    inputs = load_edi_inputs(inputs_path)
+    os.makedirs(data_dir, exist_ok=True)
+    _save_atomic(os.path.join(data_dir, 'sectors.npy'), np.asarray(inputs['sectors'], dtype=str))
+    for deprivation in DEPRIVATION_SOURCES:
+        _save_atomic(
+            os.path.join(data_dir, f'scores_{deprivation}.npy'),
+            component_scores(inputs, deprivation=deprivation),
+        )
+    return data_dir
+
+
+def init_worker(data_dir):
+    _worker_state.clear()
+    _worker_state['dir'] = data_dir
+
+
+def _worker_scores(deprivation):
+    data_dir = _worker_state.get('dir')
+    if data_dir is None:
+        raise RuntimeError("EDI worker data was not prepared")
+    if 'sectors' not in _worker_state:
+        _worker_state['sectors'] = np.load(os.path.join(data_dir, 'sectors.npy'), mmap_mode='r').tolist()
+    key = ('scores', deprivation)
+    if key not in _worker_state:
+        _worker_state[key] = np.load(os.path.join(data_dir, f'scores_{deprivation}.npy'), mmap_mode='r')
+    return _worker_state['sectors'], _worker_state[key]
+
+
+def edi_query(scenarios, weights, deprivation, sweep=None):
+    """Build the /api/edi response for the given scenarios.
+
+    weights is a tuple of (risk, crowding, deprivation) triples; it is
+    ignored when sweep is given, in which case every weighting from
+    weight_grid(sweep) is scored and summarised.
+    """
+    sectors, scores = _worker_scores(deprivation)
+    weight_matrix = weight_grid(sweep) if sweep is not None else np.asarray(weights, dtype=float)
+    edi = compute_edi(scores, weight_matrix)
+
+    result = {
+        'sectors': sectors,
+        'deprivation': deprivation,
+        'scenarios': {},
+    }
+    if sweep is not None:
+        summary = sweep_summary(edi)
+        result['weightings'] = len(weight_matrix)
+        for s in scenarios:
+            i = SCENARIOS.index(s)
+            result['scenarios'][s] = {k: v[i].round(3).tolist() for k, v in summary.items()}
+    else:
+        result['weights'] = weight_matrix.tolist()
+        for s in scenarios:
+            i = SCENARIOS.index(s)
+            result['scenarios'][s] = {
+                'edi': edi[:, i].round(3).tolist(),
+                'risk': scores[i, 0].round(3).tolist(),
+                'crowding': scores[i, 1].round(3).tolist(),
+                'deprivation': scores[i, 2].round(3).tolist(),
+            }
+    return result
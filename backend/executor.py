@@ -0,0 +1,191 @@
+"""Process-pool execution for CPU-heavy API queries.
+
+Analytic endpoints (EDI sweeps, future spatial queries) must not run on the
+event loop or the default threadpool, otherwise a single slow query stalls
+static files and /stats for everyone on our one-CPU VM. QueryExecutor runs
+them in a small process pool and adds:
+
+- request coalescing: identical in-flight queries share one computation
+- per-query timeouts (504); a query nobody is waiting for any more is left
+  to finish on its worker, unless every worker is stuck on such queries, in
+  which case the pool is terminated and restarted so the queue behind them
+  can drain
+- backpressure: once too many distinct queries are pending, new ones are
+  rejected with 503 and a Retry-After header instead of queueing forever
+
+initargs may be a callable returning the initializer arguments; it is
+called in a thread (off the event loop) each time a pool starts, so shared
+read-only data can be prepared once in the API process and handed to every
+worker. version, if given, is a callable returning a token for that data
+(e.g. an input file's mtime); when it changes, the pool is retired and a
+fresh one started with new initargs before the next query.
+"""
+import asyncio
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+
+class QueryExecutor:
+    def __init__(self, max_workers=1, max_pending=4, timeout=20.0, retry_after=5,
+                 initializer=None, initargs=(), version=None):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._initializer = initializer
+        self._initargs = initargs
+        self._version = version
+        self._pool = None
+        self._pool_version = None
+        self._pool_lock = asyncio.Lock()
+        # key -> (future, pool it runs in)
+        self._inflight = {}
+        # future -> number of callers currently awaiting it
+        self._waiters = {}
+        # Futures still running in the current pool that nobody awaits any more
+        self._abandoned = set()
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        """Build an executor sized by QUERY_WORKERS / QUERY_MAX_PENDING / QUERY_TIMEOUT."""
+        return cls(
+            max_workers=int(os.environ.get("QUERY_WORKERS", 1)),
+            max_pending=int(os.environ.get("QUERY_MAX_PENDING", 4)),
+            timeout=float(os.environ.get("QUERY_TIMEOUT", 20)),
+            **kwargs,
+        )
+
+    @property
+    def pending(self):
+        """Number of distinct queries currently queued or running."""
+        return len(self._inflight)
+
+    async def _ensure_pool(self):
+        # Started lazily so importing the app (and serving static traffic)
+        # never pays for worker start-up
+        async with self._pool_lock:
+            stale = self._version is not None and self._version() != self._pool_version
+            if self._pool is not None and stale:
+                logger.info("Query worker data changed, restarting worker pool")
+                self._retire()
+            if self._pool is None:
+                version = self._version() if self._version is not None else None
+                initargs = self._initargs
+                if callable(initargs):
+                    initargs = await asyncio.to_thread(initargs)
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    initializer=self._initializer,
+                    initargs=initargs,
+                )
+                self._pool_version = version
+        return self._pool
+
+    def _retire(self):
+        # Let queries already in the old pool finish, but stop coalescing
+        # new ones onto results computed from the old data
+        pool, self._pool = self._pool, None
+        for key in [k for k, (_, p) in self._inflight.items() if p is pool]:
+            del self._inflight[key]
+        self._abandoned.clear()
+        pool.shutdown(wait=False)
+
+    def shutdown(self, terminate=False):
+        """Stop the pool; with terminate, kill workers mid-query."""
+        pool, self._pool = self._pool, None
+        # Queries on the old pool fail with BrokenProcessPool / cancellation
+        self._inflight.clear()
+        self._abandoned.clear()
+        if pool is None:
+            return
+        if terminate:
+            # ProcessPoolExecutor has no public way to abort running work
+            for process in list(pool._processes.values()):
+                process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _busy(self, detail):
+        return HTTPException(
+            status_code=503,
+            detail=detail,
+            headers={"Retry-After": str(self.retry_after)},
+        )
+
+    async def run(self, fn, *args):
+        """Run fn(*args) in the pool and await its result.
+
+        args must be hashable: together with fn they identify the query for
+        coalescing.
+        """
+        key = (fn.__module__, fn.__qualname__, args)
+        if key not in self._inflight and self.pending >= self.max_pending:
+            raise self._busy("Server busy, try again shortly")
+
+        pool = await self._ensure_pool()
+        # Look up again: the pool may have been replaced, or an identical
+        # query started, while we waited for it
+        entry = self._inflight.get(key)
+
+        if entry is None:
+            if self.pending >= self.max_pending:
+                raise self._busy("Server busy, try again shortly")
+
+            loop = asyncio.get_running_loop()
+            try:
+                future = loop.run_in_executor(pool, fn, *args)
+            except BrokenProcessPool:
+                logger.exception("Query pool is broken, restarting it")
+                self.shutdown()
+                raise self._busy("Query workers restarting, try again shortly")
+
+            entry = (future, pool)
+            self._inflight[key] = entry
+            future.add_done_callback(lambda f: self._finish(key, f))
+
+        future, pool = entry
+        self._waiters[future] = self._waiters.get(future, 0) + 1
+        try:
+            # shield() so one caller timing out doesn't cancel the shared work
+            return await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except asyncio.TimeoutError:
+            if self._waiters[future] == 1 and not future.done() and self._pool is pool:
+                # Last caller gave up. Let the query finish on its worker,
+                # unless every worker is now held by abandoned queries and
+                # nothing else could run until they do
+                self._abandoned.add(future)
+                if len(self._abandoned) >= self.max_workers:
+                    logger.warning("Query %s timed out with every worker stuck, restarting worker pool",
+                                   fn.__qualname__)
+                    self.shutdown(terminate=True)
+                else:
+                    logger.warning("Query %s timed out, leaving it to finish", fn.__qualname__)
+            raise HTTPException(status_code=504, detail="Query timed out")
+        except asyncio.CancelledError:
+            if future.cancelled() and self._pool is not pool:
+                # Queued behind a query whose pool was recycled
+                raise self._busy("Query workers restarting, try again shortly")
+            raise
+        except BrokenProcessPool:
+            if self._pool is pool:
+                logger.exception("Query worker died, restarting pool")
+                self.shutdown()
+            raise self._busy("Query workers restarting, try again shortly")
+        finally:
+            self._waiters[future] -= 1
+            if not self._waiters[future]:
+                del self._waiters[future]
+
+    def _finish(self, key, future):
+        entry = self._inflight.get(key)
+        if entry is not None and entry[0] is future:
+            del self._inflight[key]
+        self._abandoned.discard(future)
+        # Mark the exception as retrieved when every waiter has already timed out
+        if not future.cancelled():
+            future.exception()
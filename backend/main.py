@@ -1,10 +1,69 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Query
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 import json
+import math
 import os
+import shutil
+import tempfile
+from contextlib import asynccontextmanager
+from functools import lru_cache
 
-app = FastAPI(title="Flood Risk Analysis API")
+try:
+    from backend.compare import TRANSITIONS, buildings_digest, compare_scenarios, load_comparisons, load_transitions
+    from backend.edi import SCENARIOS, DEPRIVATION_SOURCES, edi_query, init_worker, prepare_worker_data
+    from backend.executor import QueryExecutor
+except ImportError:
+    # The Docker image runs from inside backend/
+    from compare import TRANSITIONS, buildings_digest, compare_scenarios, load_comparisons, load_transitions
+    from edi import SCENARIOS, DEPRIVATION_SOURCES, edi_query, init_worker, prepare_worker_data
+    from executor import QueryExecutor
+
+# Constants
+DATA_DIR = "web_data"
+STATIC_DIR = "static"
+STATS_FILE = os.path.join(DATA_DIR, "stats.json")
+EDI_INPUTS_FILE = os.path.join(DATA_DIR, "edi_inputs.json")
+TRANSITIONS_FILE = os.path.join(DATA_DIR, "scenario_transitions.npz")
+COMPARISONS_FILE = os.path.join(DATA_DIR, "scenario_comparisons.json")
+BUILDINGS_FILE = os.path.join(DATA_DIR, "buildings.geojson")
+BUILDINGS_DIGEST_FILE = os.path.join(DATA_DIR, "buildings_digest.json")
+
+# Cap sensitivity sweeps at 20,301 weightings
+MAX_SWEEP_DIVISIONS = 200
+
+# Read-only arrays memory-mapped by every query worker
+EDI_WORKER_DIR = os.path.join(tempfile.gettempdir(), f"edi-workers-{os.getpid()}")
+
+
+def _edi_inputs_version():
+    return os.path.getmtime(EDI_INPUTS_FILE) if os.path.exists(EDI_INPUTS_FILE) else None
+
+
+def _edi_worker_args():
+    # Runs in the API process each time the pool starts. One directory per
+    # inputs version, so workers of a retired pool never mix old and new files
+    data_dir = os.path.join(EDI_WORKER_DIR, str(_edi_inputs_version()))
+    return (prepare_worker_data(EDI_INPUTS_FILE, data_dir),)
+
+
+# CPU-heavy queries run here, never on the event loop. The pool is restarted
+# with fresh worker data whenever edi_inputs.json changes.
+query_executor = QueryExecutor.from_env(
+    initializer=init_worker,
+    initargs=_edi_worker_args,
+    version=_edi_inputs_version,
+)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    query_executor.shutdown()
+    shutil.rmtree(EDI_WORKER_DIR, ignore_errors=True)
+
+
+app = FastAPI(title="Flood Risk Analysis API", lifespan=lifespan)
 
 # Allow CORS (Frontend will be on different port in dev)
 app.add_middleware(
@@ -15,11 +74,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Constants
-DATA_DIR = "web_data"
-STATIC_DIR = "static"
-STATS_FILE = os.path.join(DATA_DIR, "stats.json")
-
 # Serve Data Files (GeoJSONs)
 if os.path.exists(DATA_DIR):
     app.mount("/data", StaticFiles(directory=DATA_DIR), name="data")
@@ -31,14 +85,103 @@ if os.path.exists(STATIC_DIR):
     # So static/assets exists.
     app.mount("/assets", StaticFiles(directory=os.path.join(STATIC_DIR, "assets")), name="assets")
 
+@lru_cache(maxsize=1)
+def _load_stats(mtime):
+    with open(STATS_FILE, "r") as f:
+        return json.load(f)
+
 @app.get("/stats")
 def get_stats():
     """Return the pre-calculated statistics."""
     if os.path.exists(STATS_FILE):
-        with open(STATS_FILE, "r") as f:
-            return json.load(f)
+        # Cached in memory, re-read only when the file changes
+        return _load_stats(os.path.getmtime(STATS_FILE))
     return {"error": "Stats file not found"}
 
+def _parse_weights(weights):
+    """Parse 'r,c,d;r,c,d;...' into a tuple of weight triples."""
+    try:
+        parsed = tuple(tuple(float(w) for w in triple.split(",")) for triple in weights.split(";") if triple)
+    except ValueError:
+        parsed = ()
+    if not parsed or any(len(t) != 3 or not all(math.isfinite(w) and w >= 0 for w in t) for t in parsed):
+        raise HTTPException(status_code=400, detail="weights must be 'risk,crowding,deprivation' triples of finite non-negative numbers, separated by ';'")
+    return parsed
+
+
+@app.get("/api/edi")
+async def get_edi(scenario: str = None, weights: str = None, deprivation: str = "price", sweep: int = None):
+    """Environmental Deprivation Index per postcode sector.
+
+    Scores every scenario (or just `scenario`) for each weighting in `weights`
+    (default "1,1,1"). With `sweep=N` every Risk/Crowding/Deprivation split
+    summing to 3 is scored instead, each weight moving in steps of 3/N (so
+    `sweep=3` gives the integer weights 0-3), and a per-sector summary is
+    returned. `weights` and `sweep` cannot be combined.
+    """
+    if deprivation not in DEPRIVATION_SOURCES:
+        raise HTTPException(status_code=400, detail=f"deprivation must be one of {list(DEPRIVATION_SOURCES)}")
+    scenarios = SCENARIOS if scenario is None else (scenario.lower(),)
+    if any(s not in SCENARIOS for s in scenarios):
+        raise HTTPException(status_code=400, detail=f"scenario must be one of {list(SCENARIOS)}")
+    if sweep is not None and not 1 <= sweep <= MAX_SWEEP_DIVISIONS:
+        raise HTTPException(status_code=400, detail=f"sweep must be between 1 and {MAX_SWEEP_DIVISIONS}")
+    if sweep is not None and weights is not None:
+        raise HTTPException(status_code=400, detail="weights cannot be combined with sweep")
+    weight_triples = None if sweep is not None else _parse_weights(weights or "1,1,1")
+
+    if not os.path.exists(EDI_INPUTS_FILE):
+        return {"error": "EDI inputs not found. Run edi_analysis.py first."}
+
+    return await query_executor.run(edi_query, scenarios, weight_triples, deprivation, sweep)
+
+@lru_cache(maxsize=1)
+def _load_comparison_data(mtimes):
+    return load_transitions(TRANSITIONS_FILE), load_comparisons(COMPARISONS_FILE)
+
+@lru_cache(maxsize=1)
+def _indices_valid(mtimes, n_buildings, digest):
+    # Indices are positions in buildings.geojson, so they are only valid for
+    # the file the transitions were computed from
+    return buildings_digest(BUILDINGS_DIGEST_FILE, BUILDINGS_FILE) == (n_buildings, digest)
+
+def _mtimes(*paths):
+    return tuple(os.path.getmtime(p) if os.path.exists(p) else None for p in paths)
+
+@app.get("/api/compare")
+def get_compare(from_: str = Query(..., alias="from"), to: str = Query(...), changed: bool = False, changes: str = None):
+    """Compare two scenarios (e.g. ?from=H&to=L) using precomputed transitions.
+
+    Returns overall and per-DataZone deltas. With `changed=true` (implied by
+    `changes`) the indices (buildings.geojson feature order) of buildings
+    whose transition is in `changes` (comma-separated, default: any change)
+    are included as a packed base64 uint32 array, with the OSID digest of the
+    buildings.geojson they refer to.
+    """
+    from_scenario, to_scenario = from_.lower(), to.lower()
+    if from_scenario not in SCENARIOS or to_scenario not in SCENARIOS:
+        raise HTTPException(status_code=400, detail=f"from and to must be one of {[s.upper() for s in SCENARIOS]}")
+    change_list = None
+    if changes:
+        change_list = [c.strip() for c in changes.split(",") if c.strip()]
+        if any(c not in TRANSITIONS[1:] for c in change_list):
+            raise HTTPException(status_code=400, detail=f"changes must be from {list(TRANSITIONS[1:])}")
+        changed = True
+
+    if not (os.path.exists(TRANSITIONS_FILE) and os.path.exists(COMPARISONS_FILE)):
+        return {"error": "Scenario comparisons not found. Run scripts/preprocess_data.py first."}
+
+    transitions, comparisons = _load_comparison_data(_mtimes(TRANSITIONS_FILE, COMPARISONS_FILE))
+    if changed and not _indices_valid(
+        _mtimes(BUILDINGS_FILE, BUILDINGS_DIGEST_FILE),
+        transitions["n_buildings"], transitions["osid_digest"],
+    ):
+        raise HTTPException(status_code=409, detail="Scenario transitions are out of date with buildings.geojson. Re-run scripts/preprocess_data.py.")
+    return compare_scenarios(
+        transitions, comparisons, from_scenario, to_scenario,
+        include_changed=changed, changes=change_list
+    )
+
 # Catch-all for SPA (React Router)
 # This must be the last defined route
 @app.get("/{full_path:path}")
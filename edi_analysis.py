@@ -1,106 +1,173 @@
-import geopandas as gpd
+import argparse
+import json
+import math
+import os
+
 import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-from sklearn.preprocessing import MinMaxScaler
-
-# Set style
-sns.set_theme(style="whitegrid")
-
-print("🚀 Starting Environmental Deprivation Index (EDI) Analysis...")
-
-# --- 1. Load Data ---
-print("Loading datasets...")
-# Postcode Sectors (for Area calculation)
-sectors = gpd.read_file('GB_Postcodes/PostalSector.shp')
-if sectors.crs != 'EPSG:27700':
-    sectors = sectors.to_crs('EPSG:27700')
-
-# --- 2. Calculate Sector Metrics ---
-print("Calculating Sector Metrics...")
-
-# Calculate Area in Hectares
-sectors['Area_Ha'] = sectors.geometry.area / 10000
-
-# Load the CSVs we just made! They are clean.
-print("  Loading Oracle Export CSVs...")
-df_buildings = pd.read_csv('oracle_exports/buildings_static.csv')
-df_damages = pd.read_csv('oracle_exports/flood_damages.csv')
-
-# Filter for Medium Scenario
-df_damages_med = df_damages[df_damages['SCENARIO_ID'] == 'MEDIUM']
-
-# Merge
-df = df_buildings.merge(df_damages_med, on='OSID', how='left')
-df['DAMAGE_ESTIMATE'] = df['DAMAGE_ESTIMATE'].fillna(0)
-
-# Aggregate by Postcode Sector
-sector_stats = df.groupby('POSTCODE_SECTOR').agg({
-    'OSID': 'count',              # Total Buildings
-    'DAMAGE_ESTIMATE': 'sum',     # Total Damage
-    'PROPERTY_VALUE': 'mean'      # Average Wealth
-}).reset_index()
-
-# Merge with Geometry
-edi_df = sectors.merge(sector_stats, left_on='GISSect', right_on='POSTCODE_SECTOR', how='inner')
-
-# --- 3. Calculate Scores ---
-print("Calculating Scores...")
-
-# A. Risk Score: Damage per Hectare
-edi_df['Risk_Raw'] = edi_df['DAMAGE_ESTIMATE'] / edi_df['Area_Ha']
-
-# B. Crowding Score: Buildings per Hectare (Proxy for lack of greenspace)
-edi_df['Crowding_Raw'] = edi_df['OSID'] / edi_df['Area_Ha']
-
-# C. Deprivation Score: Inverse of Property Value (Proxy for SIMD)
-# Higher Value = Lower Score. Lower Value = Higher Score.
-edi_df['Deprivation_Raw'] = 1 / edi_df['PROPERTY_VALUE']
-
-# Normalize (0-10)
-scaler = MinMaxScaler(feature_range=(0, 10))
-edi_df[['Risk_Score', 'Crowding_Score', 'Deprivation_Score']] = scaler.fit_transform(
-    edi_df[['Risk_Raw', 'Crowding_Raw', 'Deprivation_Raw']].fillna(0)
-)
-
-# Final EDI
-edi_df['EDI_Score'] = edi_df['Risk_Score'] + edi_df['Crowding_Score'] + edi_df['Deprivation_Score']
-
-# --- 4. Visualization ---
-print("Generating Visualization...")
-
-plt.figure(figsize=(12, 8))
-scatter = sns.scatterplot(
-    data=edi_df, 
-    x='PROPERTY_VALUE', 
-    y='EDI_Score', 
-    size='DAMAGE_ESTIMATE', 
-    hue='Risk_Score', 
-    palette='viridis', 
-    sizes=(50, 1000),
-    alpha=0.7
-)
-
-plt.title('Environmental Deprivation Index (EDI) vs. Wealth', fontsize=16)
-plt.xlabel('Average Property Value (£) (Wealth Proxy)', fontsize=12)
-plt.ylabel('EDI Score (Higher = More Deprived)', fontsize=12)
-plt.axvline(x=edi_df['PROPERTY_VALUE'].median(), color='red', linestyle='--', label='Median Wealth')
-plt.axhline(y=edi_df['EDI_Score'].median(), color='blue', linestyle='--', label='Median EDI')
-
-# Annotate top 3 worst sectors
-top_3 = edi_df.sort_values('EDI_Score', ascending=False).head(3)
-for line in range(0, 3):
-    row = top_3.iloc[line]
-    plt.text(row['PROPERTY_VALUE'], row['EDI_Score'], row['GISSect'], horizontalalignment='left', size='medium', color='black', weight='semibold')
-
-plt.legend(bbox_to_anchor=(1.05, 1), loc=2, borderaxespad=0.)
-plt.tight_layout()
-
-output_img = 'edi_scatter_plot.png'
-plt.savefig(output_img, dpi=300)
-print(f"✅ Visualization saved to {output_img}")
-
-# Save Data
-edi_df[['GISSect', 'EDI_Score', 'Risk_Score', 'Crowding_Score', 'Deprivation_Score']].to_csv('edi_scores.csv', index=False)
-print("✅ EDI Scores saved to edi_scores.csv")
+
+from backend.edi import SCENARIOS, component_scores, compute_edi, load_edi_inputs
+
+# --- Configuration ---
+POSTCODE_SECTORS_SHP = 'GB_Postcodes/PostalSector.shp'
+BUILDINGS_CSV = 'oracle_exports/buildings_static.csv'
+SIMD_ZONES_CSV = 'oracle_exports/simd_zones.csv'
+FLOOD_DAMAGES_DIR = 'oracle_exports/flood_damages'
+EDI_INPUTS_FILE = 'web_data/edi_inputs.json'
+
+# Oracle export scenario IDs -> web scenario keys
+SCENARIO_IDS = {'h': 'HIGH', 'm': 'MEDIUM', 'l': 'LOW'}
+
+
+def _to_list(values):
+    """JSON-safe list with None for missing values."""
+    return [None if pd.isna(v) else float(v) for v in values]
+
+
+def build_edi_inputs(output_file=EDI_INPUTS_FILE):
+    """Aggregate the Oracle exports to per-sector EDI inputs and cache them."""
+    # Only needed when (re)building the cache
+    import geopandas as gpd
+
+    print("Loading datasets...")
+    # Postcode Sectors (for Area calculation)
+    sectors = gpd.read_file(POSTCODE_SECTORS_SHP)
+    if sectors.crs != 'EPSG:27700':
+        sectors = sectors.to_crs('EPSG:27700')
+
+    # Calculate Area in Hectares
+    sectors['Area_Ha'] = sectors.geometry.area / 10000
+
+    print("  Loading Oracle Exports...")
+    df_buildings = pd.read_csv(BUILDINGS_CSV)
+    df_simd = pd.read_csv(SIMD_ZONES_CSV, usecols=['DATAZONE', 'QUINTILEV2'])
+    df_buildings = df_buildings.merge(df_simd, on='DATAZONE', how='left')
+
+    # Aggregate by Postcode Sector
+    sector_stats = df_buildings.groupby('POSTCODE_SECTOR').agg(
+        BUILDINGS=('OSID', 'count'),
+        PROPERTY_VALUE=('PROPERTY_VALUE', 'mean'),
+        SIMD_QUINTILE=('QUINTILEV2', 'mean')
+    )
+
+    # Damages are read one scenario partition at a time
+    for key, scenario_id in SCENARIO_IDS.items():
+        damages = pd.read_parquet(
+            FLOOD_DAMAGES_DIR,
+            columns=['OSID', 'DAMAGE_ESTIMATE'],
+            filters=[('SCENARIO_ID', '==', scenario_id)]
+        )
+        sector_damage = (
+            df_buildings[['OSID', 'POSTCODE_SECTOR']]
+            .merge(damages, on='OSID', how='inner')
+            .groupby('POSTCODE_SECTOR')['DAMAGE_ESTIMATE'].sum()
+        )
+        sector_stats[f'DAMAGE_{key.upper()}'] = sector_damage.reindex(sector_stats.index).fillna(0)
+
+    # Merge with sector areas (only sectors with buildings)
+    edi_inputs = sectors[['GISSect', 'Area_Ha']].merge(
+        sector_stats, left_on='GISSect', right_index=True, how='inner'
+    )
+
+    inputs = {
+        'sectors': edi_inputs['GISSect'].tolist(),
+        'area_ha': _to_list(edi_inputs['Area_Ha']),
+        'buildings': _to_list(edi_inputs['BUILDINGS']),
+        'property_value': _to_list(edi_inputs['PROPERTY_VALUE']),
+        'simd_quintile': _to_list(edi_inputs['SIMD_QUINTILE']),
+        'damage': {key: _to_list(edi_inputs[f'DAMAGE_{key.upper()}']) for key in SCENARIOS}
+    }
+
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    with open(output_file, 'w') as f:
+        json.dump(inputs, f)
+    print(f"✅ EDI inputs cached to {output_file} ({len(inputs['sectors'])} sectors)")
+
+
+def edi_frame(inputs, scenario='m', weights=(1, 1, 1), deprivation='price'):
+    """EDI and component scores for one scenario/weighting as a DataFrame."""
+    s = SCENARIOS.index(scenario)
+    scores = component_scores(inputs, deprivation=deprivation)
+    edi = compute_edi(scores, weights)
+
+    return pd.DataFrame({
+        'GISSect': inputs['sectors'],
+        'PROPERTY_VALUE': inputs['property_value'],
+        'DAMAGE_ESTIMATE': inputs['damage'][s],
+        'EDI_Score': edi[0, s],
+        'Risk_Score': scores[s, 0],
+        'Crowding_Score': scores[s, 1],
+        'Deprivation_Score': scores[s, 2]
+    })
+
+
+def plot_edi(edi_df, output_img='edi_scatter_plot.png'):
+    """Scatter EDI against wealth and save the figure."""
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    sns.set_theme(style="whitegrid")
+
+    plt.figure(figsize=(12, 8))
+    sns.scatterplot(
+        data=edi_df,
+        x='PROPERTY_VALUE',
+        y='EDI_Score',
+        size='DAMAGE_ESTIMATE',
+        hue='Risk_Score',
+        palette='viridis',
+        sizes=(50, 1000),
+        alpha=0.7
+    )
+
+    plt.title('Environmental Deprivation Index (EDI) vs. Wealth', fontsize=16)
+    plt.xlabel('Average Property Value (£) (Wealth Proxy)', fontsize=12)
+    plt.ylabel('EDI Score (Higher = More Deprived)', fontsize=12)
+    plt.axvline(x=edi_df['PROPERTY_VALUE'].median(), color='red', linestyle='--', label='Median Wealth')
+    plt.axhline(y=edi_df['EDI_Score'].median(), color='blue', linestyle='--', label='Median EDI')
+
+    # Annotate top 3 worst sectors
+    top_3 = edi_df.sort_values('EDI_Score', ascending=False).head(3)
+    for line in range(0, len(top_3)):
+        row = top_3.iloc[line]
+        plt.text(row['PROPERTY_VALUE'], row['EDI_Score'], row['GISSect'], horizontalalignment='left', size='medium', color='black', weight='semibold')
+
+    plt.legend(bbox_to_anchor=(1.05, 1), loc=2, borderaxespad=0.)
+    plt.tight_layout()
+
+    plt.savefig(output_img, dpi=300)
+    plt.close()
+    print(f"✅ Visualization saved to {output_img}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Environmental Deprivation Index (EDI) analysis")
+    parser.add_argument('--scenario', choices=SCENARIOS, default='m')
+    parser.add_argument('--weights', type=float, nargs=3, default=[1, 1, 1],
+                        metavar=('RISK', 'CROWDING', 'DEPRIVATION'))
+    parser.add_argument('--deprivation', choices=['price', 'simd'], default='price')
+    parser.add_argument('--rebuild', action='store_true', help="Re-aggregate inputs from the Oracle exports")
+    parser.add_argument('--no-plot', action='store_true')
+    args = parser.parse_args()
+    if not all(math.isfinite(w) and w >= 0 for w in args.weights):
+        parser.error("--weights must be finite, non-negative numbers")
+
+    print("🚀 Starting Environmental Deprivation Index (EDI) Analysis...")
+
+    if args.rebuild or not os.path.exists(EDI_INPUTS_FILE):
+        build_edi_inputs()
+
+    print("Calculating Scores...")
+    edi_df = edi_frame(
+        load_edi_inputs(EDI_INPUTS_FILE),
+        scenario=args.scenario,
+        weights=args.weights,
+        deprivation=args.deprivation
+    )
+
+    if not args.no_plot:
+        print("Generating Visualization...")
+        plot_edi(edi_df)
+
+    # Save Data
+    edi_df[['GISSect', 'EDI_Score', 'Risk_Score', 'Crowding_Score', 'Deprivation_Score']].to_csv('edi_scores.csv', index=False)
+    print("✅ EDI Scores saved to edi_scores.csv")
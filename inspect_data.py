@@ -1,18 +1,30 @@
-import geopandas as gpd
-import pandas as pd
+import itertools
 
 GPKG = 'processed_data/buildings_with_flood_risk.gpkg'
 
-try:
-    print(f"Loading {GPKG}...")
-    # Read just the first few rows to inspect columns/schema
-    gdf = gpd.read_file(GPKG, rows=5)
-    print("\nColumns available:")
-    for col in gdf.columns:
-        print(f" - {col}")
-    
-    print("\nSample Data (First 3 rows):")
-    print(gdf.drop(columns='geometry').head(3).to_string())
-
-except Exception as e:
-    print(f"Error: {e}")
+
+def main():
+    # fiona reads the schema and first records without loading geopandas
+    import fiona
+    import pandas as pd
+
+    try:
+        print(f"Loading {GPKG}...")
+        # Read just the first few rows to inspect columns/schema
+        with fiona.open(GPKG) as src:
+            schema = src.schema
+            rows = [dict(feature['properties']) for feature in itertools.islice(src, 3)]
+
+        print("\nColumns available:")
+        for col, dtype in schema['properties'].items():
+            print(f" - {col} ({dtype})")
+        print(f" - geometry ({schema['geometry']})")
+
+        print("\nSample Data (First 3 rows):")
+        print(pd.DataFrame(rows, columns=list(schema['properties'])).to_string())
+    except Exception as e:
+        print(f"Error: {e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,15 @@
-import geopandas as gpd
-import fiona
-
-gdb_path = 'SEPA_River_Flood_Maps_v3_0/Data/FRM_River_Flood_Hazard_Layers_v3_0.gdb'
-layers = fiona.listlayers(gdb_path)
-print("Layers found:")
-for l in layers:
-    print(l)
+GDB_PATH = 'SEPA_River_Flood_Maps_v3_0/Data/FRM_River_Flood_Hazard_Layers_v3_0.gdb'
+
+
+def main():
+    # fiona alone is enough to read layer names; no need for geopandas
+    import fiona
+
+    layers = fiona.listlayers(GDB_PATH)
+    print("Layers found:")
+    for l in layers:
+        print(l)
+
+
+if __name__ == '__main__':
+    main()
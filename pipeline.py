@@ -0,0 +1,56 @@
+"""Single entry point for the data pipeline scripts.
+
+    python pipeline.py inspect
+    python pipeline.py list-layers
+    python pipeline.py preprocess
+    python pipeline.py export-extents
+    python pipeline.py export-oracle
+    python pipeline.py edi --scenario h --no-plot
+
+Only the standard library is imported here. Each subcommand runs its script
+as __main__, so geopandas, fiona, matplotlib etc. are imported by the
+subcommand that needs them and quick commands start fast. Arguments after
+the subcommand are passed through to the script.
+"""
+import argparse
+import os
+import runpy
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Subcommand -> (script, help)
+COMMANDS = {
+    'inspect': ('inspect_data.py', "Show the columns and a sample of the buildings GeoPackage"),
+    'list-layers': ('list_layers.py', "List the layers in the SEPA flood hazard geodatabase"),
+    'preprocess': ('scripts/preprocess_data.py', "Build web_data/ (buildings, SIMD zones, stats, comparisons)"),
+    'export-extents': ('scripts/export_extents.py', "Export simplified flood extents to web_data/"),
+    'export-oracle': ('export_to_oracle.py', "Export Oracle tables to oracle_exports/"),
+    'edi': ('edi_analysis.py', "Environmental Deprivation Index analysis (see 'edi --help')"),
+}
+
+
+def run_script(script, args):
+    """Run a pipeline script as if it were invoked directly."""
+    path = os.path.join(REPO_ROOT, script)
+    # Scripts use paths relative to the repo root
+    os.chdir(REPO_ROOT)
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    sys.argv = [path] + list(args)
+    runpy.run_path(path, run_name='__main__')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='pipeline', description="Edinburgh flood analytics pipeline")
+    subparsers = parser.add_subparsers(dest='command', required=True, metavar='COMMAND')
+    for name, (script, help_text) in COMMANDS.items():
+        # Options are left to the script itself
+        subparsers.add_parser(name, help=help_text, add_help=False)
+
+    args, script_args = parser.parse_known_args(argv)
+    run_script(COMMANDS[args.command][0], script_args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,346 @@
+"""Load test the FastAPI backend with the frontend's real traffic mix.
+
+Starts backend/main.py under uvicorn against a throwaway copy of web_data
+(any missing GeoJSONs are synthesised, so it runs fully offline), replays the
+request sequences the React app makes, and reports throughput, latency
+percentiles and bytes/s per route.
+
+    python scripts/load_test.py --concurrency 20 --duration 30 --save baseline
+    python scripts/load_test.py --concurrency 20 --duration 30 --compare baseline
+
+Results are saved to loadtest_results/<name>.json (git-ignored). Needs httpx and uvicorn
+(pip install httpx uvicorn). Note the load generator shares the machine with
+the server, so compare runs made on the same host only.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WEB_DATA_DIR = os.path.join(REPO_ROOT, 'web_data')
+RESULTS_DIR = os.path.join(REPO_ROOT, 'loadtest_results')
+
+# Request sequences recorded from the frontend (App.jsx / Map.jsx).
+# Each step is (route label, path).
+PROFILES = {
+    # Page load: SPA shell, all buildings, default (Medium) extent, SIMD layer, stats
+    'first_visit': [
+        ('spa', '/'),
+        ('buildings', '/data/buildings.geojson'),
+        ('extent', '/data/extent_medium.geojson?v=2'),
+        ('simd', '/data/simd_zones.geojson?v=2'),
+        ('stats', '/stats'),
+    ],
+    # Flipping the scenario refetches the whole extent file each time
+    'scenario_switch': [
+        ('extent', '/data/extent_high.geojson?v=2'),
+        ('extent', '/data/extent_low.geojson?v=2'),
+        ('extent', '/data/extent_medium.geojson?v=2'),
+    ],
+    # Anything else falls through to serve_spa: the shell, its icon, and a
+    # bookmarked deep link that is answered with index.html
+    'spa_route': [
+        ('spa', '/'),
+        ('spa', '/vite.svg'),
+        ('spa', '/dashboard'),
+    ],
+}
+
+# Share of virtual-user iterations spent on each profile
+DEFAULT_MIX = {'first_visit': 0.3, 'scenario_switch': 0.6, 'spa_route': 0.1}
+
+
+# --- Synthetic web_data ---
+
+def _write_geojson(path, features):
+    with open(path, 'w') as f:
+        json.dump({'type': 'FeatureCollection', 'features': features}, f)
+
+
+def _synthetic_buildings(n, rng):
+    features = []
+    for i in range(n):
+        gridcodes = sorted(rng.choice([0, 0, 0, 1, 2, 3]) for _ in range(3))
+        value = rng.uniform(150000, 600000)
+        units = rng.randint(1, 12)
+        features.append({
+            'type': 'Feature',
+            'properties': {
+                'osid': f'synthetic-{i:06d}',
+                'property_value': value,
+                'residential_units': units,
+                'damage_h': value * 0.25 * units if gridcodes[0] else 0.0,
+                'damage_m': value * 0.40 * units if gridcodes[1] else 0.0,
+                'damage_l': value * 0.75 * units if gridcodes[2] else 0.0,
+                'gridcode_h': gridcodes[0],
+                'gridcode_m': gridcodes[1],
+                'gridcode_l': gridcodes[2],
+                'description': 'Residential Building',
+                'quintile': rng.randint(1, 5),
+                'use_class': 'Residential',
+                'buildinguse_addresscount_commercial': 0,
+                'zone_name': 'Synthetic Zone',
+                'postcode_sector': f'EH{rng.randint(1, 17)} {rng.randint(1, 9)}',
+            },
+            'geometry': {'type': 'Point', 'coordinates': [rng.uniform(-3.35, -3.10), rng.uniform(55.88, 55.99)]},
+        })
+    return features
+
+
+def _synthetic_extent(n_polygons, vertices, rng):
+    features = []
+    for _ in range(n_polygons):
+        cx, cy = rng.uniform(-3.35, -3.10), rng.uniform(55.88, 55.99)
+        ring = []
+        for v in range(vertices):
+            angle = 2 * math.pi * v / vertices
+            r = rng.uniform(0.0005, 0.002)
+            ring.append([cx + r * math.cos(angle), cy + r * math.sin(angle)])
+        ring.append(ring[0])
+        features.append({
+            'type': 'Feature',
+            'properties': {'GRIDCODE': rng.randint(1, 3)},
+            'geometry': {'type': 'Polygon', 'coordinates': [ring]},
+        })
+    return features
+
+
+def prepare_workdir(workdir, n_buildings, n_extent_polygons, seed=0):
+    """Lay out web_data/ and static/ for the server, synthesising what's missing."""
+    rng = random.Random(seed)
+    data_dir = os.path.join(workdir, 'web_data')
+    os.makedirs(data_dir, exist_ok=True)
+
+    if os.path.isdir(WEB_DATA_DIR):
+        for name in os.listdir(WEB_DATA_DIR):
+            shutil.copy(os.path.join(WEB_DATA_DIR, name), data_dir)
+
+    buildings = os.path.join(data_dir, 'buildings.geojson')
+    if not os.path.exists(buildings):
+        print(f"  - Synthesising buildings.geojson ({n_buildings} features)")
+        _write_geojson(buildings, _synthetic_buildings(n_buildings, rng))
+
+    # Lower-probability events flood more, so give them more polygons
+    for i, risk in enumerate(['high', 'medium', 'low']):
+        extent = os.path.join(data_dir, f'extent_{risk}.geojson')
+        if not os.path.exists(extent):
+            count = n_extent_polygons * (i + 1)
+            print(f"  - Synthesising extent_{risk}.geojson ({count} polygons)")
+            _write_geojson(extent, _synthetic_extent(count, 64, rng))
+
+    simd = os.path.join(data_dir, 'simd_zones.geojson')
+    if not os.path.exists(simd):
+        _write_geojson(simd, [])
+
+    stats = os.path.join(data_dir, 'stats.json')
+    if not os.path.exists(stats):
+        with open(stats, 'w') as f:
+            json.dump({k: {'total_damage': 0, 'affected_buildings': 0} for k in 'hml'}, f)
+
+    # Minimal built frontend so serve_spa returns a file
+    os.makedirs(os.path.join(workdir, 'static', 'assets'), exist_ok=True)
+    with open(os.path.join(workdir, 'static', 'index.html'), 'w') as f:
+        f.write('<!doctype html><html><body><div id="root"></div></body></html>')
+
+
+# --- Server ---
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(workdir, port):
+    """Run backend.main:app under uvicorn, as in production (one process)."""
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+    return subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'backend.main:app',
+         '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning'],
+        cwd=workdir, env=env,
+    )
+
+
+def wait_for_server(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f'{url}/stats', timeout=1).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not start within {timeout}s")
+
+
+# --- Load generation ---
+
+async def virtual_user(client, mix, deadline, think_time, samples, rng):
+    profiles, weights = zip(*mix.items())
+    while time.monotonic() < deadline:
+        profile = rng.choices(profiles, weights)[0]
+        for route, path in PROFILES[profile]:
+            if time.monotonic() >= deadline:
+                return
+            start = time.perf_counter()
+            try:
+                response = await client.get(path)
+                size = len(response.content)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                size, ok = 0, False
+            samples.append((route, time.perf_counter() - start, size, ok))
+            if think_time:
+                await asyncio.sleep(rng.expovariate(1 / think_time))
+
+
+async def run_load(url, concurrency, duration, think_time, mix, seed=0):
+    samples = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        deadline = time.monotonic() + duration
+        started = time.monotonic()
+        await asyncio.gather(*[
+            virtual_user(client, mix, deadline, think_time, samples, random.Random(seed + i))
+            for i in range(concurrency)
+        ])
+        elapsed = time.monotonic() - started
+    return samples, elapsed
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarise(samples, elapsed):
+    """Per-route (and overall) throughput, latency percentiles and bytes/s."""
+    routes = {}
+    for route, latency, size, ok in samples:
+        for key in (route, 'ALL'):
+            r = routes.setdefault(key, {'latencies': [], 'bytes': 0, 'errors': 0})
+            r['latencies'].append(latency)
+            r['bytes'] += size
+            r['errors'] += 0 if ok else 1
+
+    summary = {}
+    for route, r in routes.items():
+        latencies = sorted(r['latencies'])
+        summary[route] = {
+            'requests': len(latencies),
+            'errors': r['errors'],
+            'rps': len(latencies) / elapsed,
+            'bytes_per_s': r['bytes'] / elapsed,
+            'p50_ms': _percentile(latencies, 50) * 1000,
+            'p90_ms': _percentile(latencies, 90) * 1000,
+            'p99_ms': _percentile(latencies, 99) * 1000,
+            'max_ms': latencies[-1] * 1000,
+        }
+    return summary
+
+
+def print_report(summary, baseline=None):
+    header = f"{'route':<10} {'reqs':>7} {'err':>5} {'req/s':>8} {'MB/s':>8} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8}"
+    if baseline:
+        header += f" {'Δreq/s':>8} {'Δp90':>8}"
+    print(header)
+    print('-' * len(header))
+    for route in sorted(summary, key=lambda r: (r == 'ALL', r)):
+        s = summary[route]
+        line = (f"{route:<10} {s['requests']:>7} {s['errors']:>5} {s['rps']:>8.1f} "
+                f"{s['bytes_per_s'] / 1e6:>8.2f} {s['p50_ms']:>8.1f} {s['p90_ms']:>8.1f} {s['p99_ms']:>8.1f}")
+        if baseline and route in baseline:
+            b = baseline[route]
+            line += f" {_pct_change(s['rps'], b['rps']):>8} {_pct_change(s['p90_ms'], b['p90_ms']):>8}"
+        print(line)
+
+
+def _pct_change(new, old):
+    if not old:
+        return 'n/a'
+    return f"{(new - old) / old * 100:+.0f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay frontend traffic against the FastAPI backend")
+    parser.add_argument('--url', help="Target an already running server instead of starting one")
+    parser.add_argument('--concurrency', '-c', type=int, default=10, help="Virtual users")
+    parser.add_argument('--duration', '-d', type=float, default=20, help="Seconds to run")
+    parser.add_argument('--think-time', type=float, default=0.0, help="Mean seconds between a user's requests")
+    parser.add_argument('--mix', type=json.loads, default=DEFAULT_MIX,
+                        help=f"Profile weights as JSON (default: {json.dumps(DEFAULT_MIX)})")
+    parser.add_argument('--buildings', type=int, default=78000, help="Synthetic buildings if buildings.geojson is missing")
+    parser.add_argument('--extent-polygons', type=int, default=300, help="Synthetic High extent polygons if extents are missing")
+    parser.add_argument('--save', metavar='NAME', help="Save results to loadtest_results/NAME.json")
+    parser.add_argument('--compare', metavar='NAME', help="Compare against loadtest_results/NAME.json")
+    args = parser.parse_args()
+
+    unknown = set(args.mix) - set(PROFILES)
+    if unknown:
+        parser.error(f"unknown profiles in --mix: {sorted(unknown)}")
+
+    baseline = None
+    if args.compare:
+        with open(os.path.join(RESULTS_DIR, f'{args.compare}.json')) as f:
+            baseline = json.load(f)['routes']
+
+    print("🚀 Starting load test...")
+    server, workdir = None, None
+    url = args.url
+    try:
+        if url is None:
+            workdir = tempfile.mkdtemp(prefix='flood-loadtest-')
+            prepare_workdir(workdir, args.buildings, args.extent_polygons)
+            port = _free_port()
+            url = f'http://127.0.0.1:{port}'
+            server = start_server(workdir, port)
+            wait_for_server(url)
+
+        print(f"  - {args.concurrency} users for {args.duration:.0f}s against {url}")
+        samples, elapsed = asyncio.run(
+            run_load(url, args.concurrency, args.duration, args.think_time, args.mix)
+        )
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        if workdir is not None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    summary = summarise(samples, elapsed)
+    print()
+    print_report(summary, baseline)
+
+    if args.save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        out_path = os.path.join(RESULTS_DIR, f'{args.save}.json')
+        with open(out_path, 'w') as f:
+            json.dump({
+                'config': {
+                    'url': args.url or 'local uvicorn',
+                    'concurrency': args.concurrency,
+                    'duration': args.duration,
+                    'think_time': args.think_time,
+                    'mix': args.mix,
+                    'elapsed': elapsed,
+                },
+                'routes': summary,
+            }, f, indent=2)
+        print(f"\n✅ Results saved to {out_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Scenario comparisons: the derived reverse direction matches a direct computation."""
+import base64
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.compare import (  # noqa: E402
+    DELTA_FIELDS, SCENARIO_PAIRS, TRANSITIONS, compare_scenarios, osid_digest, pair_key,
+    transition_codes, transition_counts,
+)
+
+# 0 = dry, 1-3 = depth band, 999 = No Data (flooded, depth unknown)
+GRIDCODES = {
+    'h': np.array([0, 3, 999, 2, 1, 999, 0, 3], dtype=np.int16),
+    'm': np.array([0, 2, 999, 999, 1, 0, 1, 3], dtype=np.int16),
+    'l': np.array([0, 1, 0, 999, 3, 999, 2, 3], dtype=np.int16),
+}
+ZONES = np.array(['A', 'A', 'A', 'B', 'B', 'B', 'C', 'C'])
+
+
+def _summary(codes, sign):
+    # Stand-in for what preprocess_data.py stores per pair; the delta values
+    # only need to be distinct and non-zero
+    zones = {}
+    for i, zone in enumerate(sorted(set(ZONES))):
+        zones[zone] = {
+            'damage_delta': sign * 100.0 * (i + 1),
+            'units_at_risk_delta': sign * 0.5 * (i + 1),
+            'affected_buildings_delta': sign * (i + 1),
+            **transition_counts(codes[ZONES == zone]),
+        }
+        del zones[zone]['unchanged']
+    return {
+        'damage_delta': sign * 1234.5,
+        'units_at_risk_delta': sign * 2.5,
+        'affected_buildings_delta': sign * 3,
+        'transitions': transition_counts(codes),
+        'zones': zones,
+    }
+
+
+def _fixtures():
+    osids = [f'osid-{i}' for i in range(len(ZONES))]
+    transitions = {'n_buildings': len(osids), 'osid_digest': osid_digest(osids)}
+    comparisons = {}
+    for a, b in SCENARIO_PAIRS:
+        codes = transition_codes(GRIDCODES[a], GRIDCODES[b])
+        transitions[pair_key(a, b)] = codes
+        comparisons[pair_key(a, b)] = _summary(codes, sign=1)
+    return transitions, comparisons
+
+
+def test_transition_codes_handle_no_data():
+    codes = transition_codes(GRIDCODES['h'], GRIDCODES['l'])
+    assert [TRANSITIONS[c] for c in codes] == [
+        'unchanged',          # 0 -> 0
+        'depth_decreased',    # 3 -> 1
+        'no_longer_flooded',  # 999 -> 0
+        'unchanged',          # 2 -> 999: still flooded, depth unknown
+        'depth_increased',    # 1 -> 3
+        'unchanged',          # 999 -> 999
+        'newly_flooded',      # 0 -> 2
+        'unchanged',          # 3 -> 3
+    ]
+
+
+def test_reverse_direction_matches_direct_computation():
+    transitions, comparisons = _fixtures()
+    result = compare_scenarios(transitions, comparisons, 'l', 'h', include_changed=True)
+    direct = transition_codes(GRIDCODES['l'], GRIDCODES['h'])
+
+    assert result['transitions'] == transition_counts(direct)
+
+    changed = result['changed']
+    indices = np.frombuffer(base64.b64decode(changed['indices']), dtype='<u4')
+    codes = np.frombuffer(base64.b64decode(changed['transitions']), dtype=np.uint8)
+    assert indices.tolist() == np.flatnonzero(direct).tolist()
+    assert codes.tolist() == direct[direct > 0].tolist()
+
+    stored = comparisons[pair_key('h', 'l')]
+    for field in DELTA_FIELDS:
+        assert result[field] == -stored[field]
+        for zone, z in result['zones'].items():
+            assert z[field] == -stored['zones'][zone][field]
+    for zone, z in result['zones'].items():
+        expected = transition_counts(direct[ZONES == zone])
+        assert {name: z[name] for name in TRANSITIONS[1:]} == {name: expected[name] for name in TRANSITIONS[1:]}
+
+
+def test_changes_filter_in_reverse_direction():
+    transitions, comparisons = _fixtures()
+    result = compare_scenarios(transitions, comparisons, 'l', 'h', include_changed=True,
+                               changes=['newly_flooded'])
+    direct = transition_codes(GRIDCODES['l'], GRIDCODES['h'])
+    indices = np.frombuffer(base64.b64decode(result['changed']['indices']), dtype='<u4')
+    assert indices.tolist() == np.flatnonzero(direct == TRANSITIONS.index('newly_flooded')).tolist()
@@ -0,0 +1,123 @@
+"""QueryExecutor: coalescing, backpressure, timeouts and pool refresh."""
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+from fastapi import HTTPException
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.executor import QueryExecutor  # noqa: E402
+
+_worker_state = {}
+
+
+def _sleep(seconds):
+    """Sleep, then report when the query ran so coalesced calls can be told apart."""
+    time.sleep(seconds)
+    return time.time()
+
+
+def _init(value):
+    _worker_state['value'] = value
+
+
+def _value():
+    return _worker_state.get('value')
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_identical_queries_run_once():
+    executor = QueryExecutor(max_workers=1, max_pending=1, timeout=10)
+
+    async def scenario():
+        calls = [asyncio.create_task(executor.run(_sleep, 0.5)) for _ in range(5)]
+        await asyncio.sleep(0.1)
+        # Five callers, one pending query, no 503 despite max_pending=1
+        assert executor.pending == 1
+        return await asyncio.gather(*calls)
+
+    try:
+        results = _run(scenario())
+    finally:
+        executor.shutdown()
+    assert len(set(results)) == 1
+
+
+def test_distinct_query_over_limit_is_rejected():
+    executor = QueryExecutor(max_workers=1, max_pending=2, timeout=10, retry_after=7)
+
+    async def scenario():
+        running = [asyncio.create_task(executor.run(_sleep, s)) for s in (0.5, 0.6)]
+        await asyncio.sleep(0.1)
+        with pytest.raises(HTTPException) as rejected:
+            await executor.run(_sleep, 0.7)
+        await asyncio.gather(*running)
+        return rejected.value
+
+    try:
+        rejected = _run(scenario())
+    finally:
+        executor.shutdown()
+    assert rejected.status_code == 503
+    assert rejected.headers['Retry-After'] == '7'
+
+
+def test_timeout_then_next_query_succeeds():
+    executor = QueryExecutor(max_workers=1, timeout=1.0)
+
+    async def scenario():
+        with pytest.raises(HTTPException) as timed_out:
+            await executor.run(_sleep, 30)
+        assert timed_out.value.status_code == 504
+        # The only worker was stuck, so it was recycled rather than waited for
+        return await executor.run(_sleep, 0)
+
+    try:
+        assert _run(scenario()) > 0
+    finally:
+        executor.shutdown(terminate=True)
+
+
+def test_timeout_leaves_other_workers_running():
+    executor = QueryExecutor(max_workers=2, timeout=1.5)
+
+    async def scenario():
+        runaway = asyncio.create_task(executor.run(_sleep, 30))
+        await asyncio.sleep(0.5)
+        # Still running on the second worker when the runaway times out
+        healthy = asyncio.create_task(executor.run(_sleep, 1.2))
+        with pytest.raises(HTTPException) as timed_out:
+            await runaway
+        assert timed_out.value.status_code == 504
+        return await healthy
+
+    try:
+        assert _run(scenario()) > 0
+    finally:
+        executor.shutdown(terminate=True)
+
+
+def test_pool_restarts_when_version_changes():
+    version = ['a']
+    executor = QueryExecutor(
+        max_workers=1,
+        initializer=_init,
+        initargs=lambda: (version[0],),
+        version=lambda: version[0],
+    )
+
+    async def scenario():
+        first = await executor.run(_value)
+        version[0] = 'b'
+        return first, await executor.run(_value)
+
+    try:
+        assert _run(scenario()) == ('a', 'b')
+    finally:
+        executor.shutdown()
@@ -0,0 +1,106 @@
+"""Import-time budget for the pipeline CLI.
+
+Quick commands (pipeline.py --help, list-layers, a cached edi run) must not
+pay for geopandas, fiona, matplotlib, seaborn or sklearn. Each check runs in
+a fresh interpreter so modules imported by pytest itself don't interfere.
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Seconds; generous for a cold interpreter, far below a geopandas import
+IMPORT_BUDGET = 1.0
+
+HEAVY_MODULES = ('geopandas', 'fiona', 'matplotlib', 'seaborn', 'sklearn')
+
+# Prelude for running a command without the data files: a stub fiona that
+# serves a tiny layer, and a meta path hook recording any attempt to import
+# a heavy module, whether or not it is installed here
+_STUB_FIONA = """
+import json, sys, types
+
+attempted = []
+
+class _Watch:
+    def find_spec(self, name, path=None, target=None):
+        if name.split('.')[0] in HEAVY:
+            attempted.append(name)
+        return None
+
+class _Collection:
+    schema = {'properties': {'osid': 'str', 'gridcode_m': 'int'}, 'geometry': 'Polygon'}
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc):
+        return False
+    def __iter__(self):
+        for i in range(5):
+            yield {'properties': {'osid': f'id{i}', 'gridcode_m': i}, 'geometry': None}
+
+fiona = types.ModuleType('fiona')
+fiona.open = lambda path: _Collection()
+fiona.listlayers = lambda path: ['stub_layer']
+sys.modules['fiona'] = fiona
+sys.meta_path.insert(0, _Watch())
+"""
+
+
+def _run(args):
+    """Best-of-three wall time for `python <args>` from the repo root."""
+    timings = []
+    for _ in range(3):
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable] + args, cwd=REPO_ROOT, capture_output=True, text=True
+        )
+        timings.append(time.perf_counter() - start)
+        assert result.returncode == 0, result.stderr
+    return min(timings), result.stdout
+
+
+def test_cli_help_within_budget():
+    elapsed, stdout = _run(['pipeline.py', '--help'])
+    assert 'list-layers' in stdout
+    assert elapsed < IMPORT_BUDGET
+
+
+@pytest.mark.parametrize('module', [
+    'pipeline',
+    'edi_analysis',
+    'export_to_oracle',
+    'inspect_data',
+    'list_layers',
+    'scripts.preprocess_data',
+    'scripts.export_extents',
+])
+def test_import_is_fast_and_lazy(module):
+    code = (
+        f'import json, sys; import {module}; '
+        f'print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))'
+    )
+    elapsed, stdout = _run(['-c', code])
+    assert json.loads(stdout.strip().splitlines()[-1]) == []
+    assert elapsed < IMPORT_BUDGET
+
+
+@pytest.mark.parametrize('module, expected', [
+    ('inspect_data', 'gridcode_m (int)'),
+    ('list_layers', 'stub_layer'),
+])
+def test_command_does_not_load_geopandas(module, expected):
+    heavy = tuple(m for m in HEAVY_MODULES if m != 'fiona')
+    code = (
+        f'HEAVY = {heavy!r}\n{_STUB_FIONA}\n'
+        f'import {module}; {module}.main()\n'
+        f'print(json.dumps(attempted + [m for m in HEAVY if m in sys.modules]))'
+    )
+    result = subprocess.run([sys.executable, '-c', code], cwd=REPO_ROOT, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert expected in result.stdout
+    assert json.loads(result.stdout.strip().splitlines()[-1]) == []